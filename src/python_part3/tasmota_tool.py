@@ -5,55 +5,146 @@
 # validates sensor payloads over MQTT, and generates a JSON test report.
 
 import argparse
-import json
+import os
+import select
 import socket
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Optional
+from urllib.parse import quote_plus
 
-import requests
-from zeroconf import Zeroconf, ServiceBrowser, ServiceListener
+import dns.flags
+import dns.message
+import dns.name
+import dns.rdatatype
 import paho.mqtt.client as mqtt
+import urllib3
+
+# orjson is optional — parses bytes directly and serializes several times
+# faster; fall back to stdlib json with the same report layout
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _dumps_line(obj):
+        return orjson.dumps(obj) + b"\n"
+except ImportError:
+    import json
+
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode("utf-8")
+
+    def _dumps_line(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n"
 
 
 # ── 1. Discovery ────────────────────────────────────────────────────────────
 
-class TasmotaListener(ServiceListener):
-    """Collects IPv4 addresses from mDNS — no blocking work in callbacks."""
+MDNS_GROUP = ("224.0.0.251", 5353)
+HTTP_SERVICE = dns.name.from_text("_http._tcp.local.")
 
-    def __init__(self):
-        self.ips = set()
 
-    def add_service(self, zc, stype, name):
-        info = zc.get_service_info(stype, name)
-        if not info:
-            return
-        for addr in info.addresses:
-            if len(addr) == 4:  # IPv4 only; inet_ntoa crashes on IPv6
-                self.ips.add(socket.inet_ntoa(addr))
+# send a PTR query for _http._tcp.local. and yield each new IPv4 address as
+# responses arrive — no per-service follow-up queries, no background thread.
+# it is a legacy unicast query (RFC 6762 §6.7): sent from an ephemeral port,
+# so responders answer us directly and port 5353 is never bound or shared.
+# re-sent at 1 s and 2 s since WiFi multicast is unacknowledged. socket
+# errors (no multicast route, ...) are reported and end the scan.
+# setting the optional `stop` event ends the scan early (checked every 0.1 s)
+def mdns_browse(timeout, stop=None):
+    query = dns.message.make_query(HTTP_SERVICE, dns.rdatatype.PTR)
+    query.flags = 0  # mDNS queries carry no RD flag
+    wire = query.to_wire()
+
+    seen = set()
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    except OSError as e:
+        print(f"[!] mDNS query failed: {e}")
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
+        start = time.time()
+        deadline = start + timeout
+        resend_at = [t for t in (start + 1, start + 2) if t < deadline]
+        sock.sendto(wire, MDNS_GROUP)
+        while (remaining := deadline - time.time()) > 0:
+            if stop is not None and stop.is_set():
+                break
+            if resend_at and time.time() >= resend_at[0]:
+                resend_at.pop(0)
+                sock.sendto(wire, MDNS_GROUP)
+            wait = min(remaining, resend_at[0] - time.time()) if resend_at else remaining
+            if stop is not None:
+                wait = min(wait, 0.1)
+            ready, _, _ = select.select([sock], [], [], max(0.0, wait))
+            if not ready:
+                continue
+            data, (src, _) = sock.recvfrom(9000)
+            try:
+                msg = dns.message.from_wire(data)
+            except Exception:
+                continue
+            # only responses that answer our PTR question
+            if not msg.flags & dns.flags.QR or not any(
+                    rr.rdtype == dns.rdatatype.PTR and rr.name == HTTP_SERVICE
+                    for rr in msg.answer):
+                continue
+            # A records ride along in the response; to_wire() also covers
+            # records parsed as generic if a responder sets the cache-flush bit
+            ips = [socket.inet_ntoa(rd.to_wire())
+                   for rr in msg.answer + msg.additional
+                   if rr.rdtype == dns.rdatatype.A for rd in rr] or [src]
+            for ip in ips:
+                if ip not in seen:
+                    seen.add(ip)
+                    yield ip
+    except OSError as e:
+        print(f"[!] mDNS query failed: {e}")
+    finally:
+        sock.close()
 
-    def remove_service(self, *a): pass
-    def update_service(self, *a): pass
 
+# shared urllib3 pool — keep-alive reuses one TCP connection per device
+# across probe/configure/wait instead of a fresh handshake per command.
+# retries off to match requests' behaviour (no hidden re-sends on timeout)
+_POOL = urllib3.PoolManager(num_pools=16, maxsize=32, block=False, retries=False)
 
-# HTTP GET with optional Tasmota WebUI authentication
-def http_get_json(ip, path, *, params=None, timeout=3,
-                  web_user=None, web_pass=None):
-    url = f"http://{ip}{path}"
-    params = dict(params or {})
+
+# WebUI auth query fragment — encoded once per credential pair, not per call
+@lru_cache(maxsize=None)
+def _auth_qs(web_user, web_pass):
     if web_user and web_pass:
-        params["user"] = web_user
-        params["password"] = web_pass
-    r = requests.get(url, params=params, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+        return f"&user={quote_plus(web_user)}&password={quote_plus(web_pass)}"
+    return ""
+
+
+# HTTP GET of /cm?cmnd=<command> with optional Tasmota WebUI authentication
+# the URL is pre-formatted and sent straight through urllib3 — no
+# PreparedRequest/adapter/hook layers per call
+def http_get_json(ip, command, *, timeout=3, web_user=None, web_pass=None):
+    url = f"http://{ip}/cm?cmnd={quote_plus(command)}{_auth_qs(web_user, web_pass)}"
+    r = _POOL.request("GET", url, timeout=timeout)
+    if r.status >= 400:
+        raise urllib3.exceptions.HTTPError(f"HTTP {r.status} for {ip}: {command}")
+    return _loads(r.data)
 
 
 # verify an IP is a Tasmota device via Status 0
 def probe_tasmota(ip, *, web_user=None, web_pass=None):
     try:
-        data = http_get_json(ip, "/cm", params={"cmnd": "Status 0"},
-                             timeout=2, web_user=web_user, web_pass=web_pass)
+        data = http_get_json(ip, "Status 0", timeout=2,
+                             web_user=web_user, web_pass=web_pass)
         if not isinstance(data, dict) or "StatusNET" not in data or "Status" not in data:
             return None
         host = data.get("StatusNET", {}).get("Hostname", ip)
@@ -63,121 +154,206 @@ def probe_tasmota(ip, *, web_user=None, web_pass=None):
         return None
 
 
-# discover Tasmota devices via mDNS, then probe each candidate
-def discover(timeout=5.0, *, web_user=None, web_pass=None):
-    print(f"[*] mDNS scan ({timeout}s) ...")
-    zc = Zeroconf()
-    listener = TasmotaListener()
-    browser = ServiceBrowser(zc, "_http._tcp.local.", listener)
-    try:
-        time.sleep(timeout)
-    finally:
-        try:
-            browser.cancel()
-        except Exception:
-            pass
-        zc.close()
-
-    print(f"[*] Found {len(listener.ips)} candidate IP(s), probing ...")
-    devices = []
-    for ip in sorted(listener.ips):
-        dev = probe_tasmota(ip, web_user=web_user, web_pass=web_pass)
-        if dev:
-            devices.append(dev)
-    return devices
+# discover Tasmota devices via mDNS, probing each candidate as soon as it
+# is seen so probes overlap the scan window instead of following it
+# with `expected`, the scan ends as soon as that many Tasmota devices are
+# confirmed — any _http._tcp responder (router, printer, ...) is a
+# candidate, so count successful probes, not IPs
+def discover(timeout=5.0, *, expected=None, web_user=None, web_pass=None):
+    print(f"[*] mDNS scan ({timeout}s), probing candidates as they appear ...")
+    stop = threading.Event()
+    confirmed = []
+
+    def on_probed(future):
+        if future.result():
+            confirmed.append(future)
+            if expected and len(confirmed) >= expected:
+                stop.set()
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=32) as ex:
+        for ip in mdns_browse(timeout, stop):
+            futures[ip] = ex.submit(probe_tasmota, ip,
+                                    web_user=web_user, web_pass=web_pass)
+            futures[ip].add_done_callback(on_probed)
+        print(f"[*] Found {len(futures)} candidate IP(s), waiting for probes ...")
+    # sorted by IP so devices[0] is stable between runs
+    devices = (futures[ip].result() for ip in sorted(futures))
+    return [dev for dev in devices if dev]
 
 
 # ── 2. Configuration ────────────────────────────────────────────────────────
 
 # send a single Tasmota command via the HTTP API
 def cmd(ip, command, *, web_user=None, web_pass=None):
-    return http_get_json(ip, "/cm", params={"cmnd": command},
-                         timeout=6, web_user=web_user, web_pass=web_pass)
+    return http_get_json(ip, command, timeout=6,
+                         web_user=web_user, web_pass=web_pass)
 
 
 # poll Status 0 until the device responds or timeout expires
-def wait_for_device(ip, timeout=30, *, web_user=None, web_pass=None):
+# with restart=True, first wait (up to 10s) for the device to drop off —
+# Backlog runs after the HTTP reply, so the device is briefly still up
+# backoff starts at 100 ms and grows to 1 s, so a quick return is caught early
+def wait_for_device(ip, timeout=30, *, restart=False, web_user=None, web_pass=None):
     print(f"[*] Waiting for {ip} to come back (up to {timeout}s) ...")
     deadline = time.time() + timeout
+    if restart:
+        down_deadline = min(deadline, time.time() + 10)
+        while time.time() < down_deadline and probe_tasmota(
+                ip, web_user=web_user, web_pass=web_pass):
+            time.sleep(0.5)
+    delay = 0.1
     while time.time() < deadline:
         if probe_tasmota(ip, web_user=web_user, web_pass=web_pass):
             print(f"[✓] Device {ip} is back online")
             return True
-        time.sleep(1)
+        time.sleep(delay)
+        delay = min(delay * 1.5, 1.0)
     print(f"[!] Device {ip} did not respond within {timeout}s")
     return False
 
 
-# configure WiFi and MQTT via individual HTTP commands
-# commands sent individually (not Backlog) because Backlog splits on ';'
-# before parsing — values containing ';' would silently corrupt config
-# spaces are handled by URL encoding (requests library)
+# where each setting shows up in the Status 0 response
+READBACK_PATHS = {
+    "SSID1":      ("StatusSTS", "Wifi", "SSId"),
+    "MqttHost":   ("StatusMQT", "MqttHost"),
+    "MqttPort":   ("StatusMQT", "MqttPort"),
+    "MqttUser":   ("StatusMQT", "MqttUser"),
+    "Topic":      ("Status", "Topic"),
+    "TelePeriod": ("StatusLOG", "TelePeriod"),
+}
+WRITE_ONLY_SECRETS = ("Password1", "MqttPassword")  # never echoed by Tasmota
+
+
+# configure WiFi and MQTT in a single Backlog HTTP command (one round-trip)
+# Backlog splits on ';' before parsing, so if any value contains ';' the
+# commands are sent individually instead — otherwise config would silently
+# corrupt. spaces are handled by URL encoding (quote_plus)
+# returns the requested settings (secrets redacted) for read_back_config
 def configure(ip, ssid, wifi_pass, mqtt_host, mqtt_port,
               mqtt_user, mqtt_pass, topic, *, web_user=None, web_pass=None):
     print(f"[*] Configuring {ip} ...")
-    res = {}
-    res["SSID1"]     = cmd(ip, f"SSID1 {ssid}", web_user=web_user, web_pass=web_pass)
-    res["Password1"] = cmd(ip, f"Password1 {wifi_pass}", web_user=web_user, web_pass=web_pass)
-    res["MqttHost"]  = cmd(ip, f"MqttHost {mqtt_host}", web_user=web_user, web_pass=web_pass)
-    res["MqttPort"]  = cmd(ip, f"MqttPort {mqtt_port}", web_user=web_user, web_pass=web_pass)
+    settings = [
+        ("SSID1", ssid),
+        ("Password1", wifi_pass),
+        ("MqttHost", mqtt_host),
+        ("MqttPort", mqtt_port),
+    ]
     if mqtt_user:
-        res["MqttUser"] = cmd(ip, f"MqttUser {mqtt_user}", web_user=web_user, web_pass=web_pass)
+        settings.append(("MqttUser", mqtt_user))
     if mqtt_pass:
-        res["MqttPassword"] = cmd(ip, f"MqttPassword {mqtt_pass}", web_user=web_user, web_pass=web_pass)
+        settings.append(("MqttPassword", mqtt_pass))
     if topic:
-        res["Topic"] = cmd(ip, f"Topic {topic}", web_user=web_user, web_pass=web_pass)
-    res["TelePeriod"] = cmd(ip, "TelePeriod 10", web_user=web_user, web_pass=web_pass)
-    print("[✓] Configuration applied")
+        settings.append(("Topic", topic))
+    settings.append(("TelePeriod", 10))
+
+    if any(";" in str(value) for _, value in settings):
+        for name, value in settings:
+            cmd(ip, f"{name} {value}", web_user=web_user, web_pass=web_pass)
+    else:
+        backlog = "; ".join(f"{name} {value}" for name, value in settings)
+        cmd(ip, f"Backlog {backlog}", web_user=web_user, web_pass=web_pass)
+    print("[✓] Configuration sent")
 
     # redact secrets before returning
-    res["Password1"] = "***"
-    if "MqttPassword" in res:
-        res["MqttPassword"] = "***"
+    return {name: "***" if name in WRITE_ONLY_SECRETS else value
+            for name, value in settings}
+
+
+# confirm settings with one Status 0 read-back after the restart
+# Backlog is queued and run after the HTTP reply, so its response can't
+# confirm anything — the read-back is what goes into the report
+def read_back_config(ip, requested, *, web_user=None, web_pass=None):
+    try:
+        status = cmd(ip, "Status 0", web_user=web_user, web_pass=web_pass)
+    except Exception as e:
+        print(f"[!] Could not read back configuration: {e}")
+        return {name: None for name in requested}
+    res = {}
+    for name, value in requested.items():
+        if name in WRITE_ONLY_SECRETS:
+            res[name] = "***"
+            continue
+        applied = status
+        for key in READBACK_PATHS[name]:
+            applied = applied.get(key) if isinstance(applied, dict) else None
+        res[name] = applied
+        if str(applied) != str(value):
+            print(f"[!] {name} not applied (device reports {applied!r})")
+    print("[✓] Configuration read back")
     return res
 
 
 # ── 3. Validation ────────────────────────────────────────────────────────────
 
-REQUIRED_KEYS = ["Temperature", "Humidity", "Pressure"]
+REQUIRED_KEYS = ("Temperature", "Humidity", "Pressure")
+_NUMERIC = (int, float)
+_EXACT_NUMERIC = frozenset(_NUMERIC)  # type() set lookup beats isinstance
 
 
 # validate a Tasmota SENSOR payload against expected CustomSensor format
+# runs per MQTT message — a valid payload (all plain int/float values)
+# returns from the first loop; anything else (missing, non-numeric,
+# int/float subclasses such as bool) goes through the full check
 def validate_payload(payload):
-    errors = []
     cs = payload.get("CustomSensor")
     if cs is None:
         return ["Missing 'CustomSensor' key"]
+    for k in REQUIRED_KEYS:
+        if type(cs.get(k)) not in _EXACT_NUMERIC:
+            break
+    else:
+        return []
+    errors = []
     for k in REQUIRED_KEYS:
         v = cs.get(k)
         if v is None:
             errors.append(f"Missing '{k}'")
-        elif not isinstance(v, (int, float)):
+        elif not isinstance(v, _NUMERIC):
             errors.append(f"'{k}' not numeric: {v!r}")
     return errors
 
 
 # subscribe to tele/<topic>/SENSOR and validate each message
+# results are streamed as NDJSON to results_path (one line per message)
+# so memory stays flat regardless of duration or message rate
+# with trigger_ip, an immediate SENSOR publish is forced once subscribed and
+# listening stops at the first message (falls back to the full duration)
 def subscribe_and_validate(mqtt_host, mqtt_port, topic, duration,
-                           mqtt_user, mqtt_pass):
-    results = []
+                           mqtt_user, mqtt_pass, results_path, *,
+                           trigger_ip=None, web_user=None, web_pass=None):
     sub_topic = f"tele/{topic}/SENSOR"
+    received = 0
+    subscribed = False
 
     def on_connect(client, ud, flags, rc, props=None):
         if rc == 0:
             print(f"[*] Subscribed to {sub_topic}")
-            client.subscribe(sub_topic)
+            # QoS 0: telemetry validation needs no acks or broker-side state
+            client.subscribe(sub_topic, qos=0)
         else:
             print(f"[!] MQTT connect failed rc={rc}")
 
+    # callback signature differs between paho 1.x and 2.x
+    def on_subscribe(client, ud, *args):
+        nonlocal subscribed
+        subscribed = True
+
+    # ts is stored as a float epoch; formatted to ISO once in generate_report
+    # `out` is the results file opened around the network loop below
     def on_message(client, ud, msg):
-        ts = datetime.now(timezone.utc).isoformat()
+        nonlocal received
+        received += 1
+        ts = time.time()
+        # runs on the caller's thread — an exception here would escape
+        # c.loop() and abort the run, so record it as an invalid message
         try:
-            payload = json.loads(msg.payload)
+            payload = _loads(msg.payload)
+            errs = validate_payload(payload)
         except Exception as e:
-            results.append({"ts": ts, "valid": False, "errors": [str(e)]})
+            out.write(_dumps_line({"ts": ts, "valid": False, "errors": [str(e)]}))
             return
-        errs = validate_payload(payload)
-        results.append({"ts": ts, "valid": len(errs) == 0, "errors": errs, "payload": payload})
+        out.write(_dumps_line({"ts": ts, "valid": len(errs) == 0, "errors": errs, "payload": payload}))
 
     # paho-mqtt 2.x uses CallbackAPIVersion; fall back for 1.x
     try:
@@ -188,37 +364,86 @@ def subscribe_and_validate(mqtt_host, mqtt_port, topic, duration,
     if mqtt_user:
         c.username_pw_set(mqtt_user, mqtt_pass)
     c.on_connect = on_connect
+    c.on_subscribe = on_subscribe
     c.on_message = on_message
 
     print(f"[*] Listening on MQTT {mqtt_host}:{mqtt_port} for {duration}s ...")
-    c.connect(mqtt_host, mqtt_port)
-    c.loop_start()
-    time.sleep(duration)
-    c.loop_stop()
-    c.disconnect()
-    return results
+    # drive the network loop from this thread until the deadline — no
+    # background loop_start() thread contending for the GIL per message
+    with open(results_path, "wb") as out:
+        c.connect(mqtt_host, mqtt_port)
+        deadline = time.time() + duration
+        triggered = False
+        delay = 1
+        while (remaining := deadline - time.time()) > 0:
+            if trigger_ip and subscribed and not triggered:
+                triggered = True
+                try:
+                    # re-setting TelePeriod makes Tasmota publish SENSOR now
+                    cmd(trigger_ip, "TelePeriod 10", web_user=web_user, web_pass=web_pass)
+                    print("[*] Requested immediate SENSOR publish")
+                except Exception as e:
+                    print(f"[!] Could not trigger SENSOR publish: {e}")
+            if triggered and received:
+                break
+            rc = c.loop(timeout=min(1.0, remaining))
+            if rc == mqtt.MQTT_ERR_SUCCESS:
+                delay = 1
+                continue
+            # connection lost — reconnect with backoff (what loop_start()
+            # did for us); on_connect re-subscribes once it succeeds
+            print(f"[!] MQTT connection lost rc={rc}, reconnecting in {delay}s ...")
+            time.sleep(min(delay, max(0.0, deadline - time.time())))
+            delay = min(delay * 2, 4)
+            try:
+                c.reconnect()
+            except OSError as e:
+                print(f"[!] MQTT reconnect failed: {e}")
+        c.disconnect()
+    return results_path
 
 
 # ── 4. Report ────────────────────────────────────────────────────────────────
 
+# iterate validation entries from an NDJSON results file, ISO-formatting ts
+def _iter_results(results_path):
+    with open(results_path, "rb") as f:
+        for line in f:
+            v = _loads(line)
+            if isinstance(v.get("ts"), float):
+                v["ts"] = datetime.fromtimestamp(v["ts"], timezone.utc).isoformat()
+            yield v
+
+
 # generate JSON test report with pass/fail summary
-def generate_report(devices, config_res, validation, path):
-    passed = sum(1 for v in validation if v["valid"])
+# validation entries are streamed from the NDJSON results file one at a
+# time, so the full message list is never held in memory — the returned
+# report therefore omits "validation" (it is only written to `path`)
+def generate_report(devices, config_res, results_path, path):
+    received = passed = 0
+    for v in _iter_results(results_path):
+        received += 1
+        passed += v["valid"]
     report = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "summary": {
             "devices_found": len(devices),
-            "messages_received": len(validation),
+            "messages_received": received,
             "valid": passed,
-            "invalid": len(validation) - passed,
-            "pass": passed > 0 and passed == len(validation),
+            "invalid": received - passed,
+            "pass": passed > 0 and passed == received,
         },
         "devices": devices,
         "configuration": config_res,
-        "validation": validation,
     }
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2)
+    with open(path, "wb") as f:
+        # splice the streamed "validation" array in before the closing brace
+        f.write(_dumps(report)[:-2])
+        f.write(b',\n  "validation": [')
+        for i, v in enumerate(_iter_results(results_path)):
+            f.write(b",\n    " if i else b"\n    ")
+            f.write(_dumps(v).replace(b"\n", b"\n    "))
+        f.write(b"\n  ]\n}" if received else b"]\n}")
     print(f"[✓] Report saved to {path}")
     return report
 
@@ -238,8 +463,12 @@ def main():
     p.add_argument("--mqtt-pass",    default="")
     p.add_argument("--mqtt-topic",   default=None, help="device topic (auto-detected if omitted)")
     p.add_argument("--duration",     type=float, default=30, help="MQTT listen duration in seconds")
+    p.add_argument("--quick",        action="store_true",
+                   help="force an immediate SENSOR publish and stop after the first message")
     p.add_argument("--output",       default="report.json", help="report output path")
     p.add_argument("--mdns-timeout", type=float, default=5.0)
+    p.add_argument("--expect",       type=int, default=None,
+                   help="stop mDNS scan early once this many Tasmota devices are confirmed")
     args = p.parse_args()
 
     # 1. discover
@@ -250,7 +479,8 @@ def main():
         if not dev:
             print(f"[!] {args.device_ip} did not respond as a Tasmota device")
     else:
-        devices = discover(args.mdns_timeout, web_user=args.web_user, web_pass=args.web_pass)
+        devices = discover(args.mdns_timeout, expected=args.expect,
+                           web_user=args.web_user, web_pass=args.web_pass)
 
     if not devices:
         print("[!] No devices found")
@@ -267,23 +497,36 @@ def main():
 
     # 2. configure
     target = devices[0]["ip"]
-    config_res = configure(
+    requested = configure(
         target, args.ssid, args.wifi_pass,
         args.mqtt_host, args.mqtt_port, args.mqtt_user, args.mqtt_pass,
         topic, web_user=args.web_user, web_pass=args.web_pass,
     )
 
-    if not wait_for_device(target, web_user=args.web_user, web_pass=args.web_pass):
+    if not wait_for_device(target, restart=True,
+                           web_user=args.web_user, web_pass=args.web_pass):
         print("[!] Proceeding anyway ...")
+    config_res = read_back_config(target, requested,
+                                  web_user=args.web_user, web_pass=args.web_pass)
 
     # 3. validate
-    validation = subscribe_and_validate(
-        args.mqtt_host, args.mqtt_port, topic,
-        args.duration, args.mqtt_user, args.mqtt_pass,
-    )
-
-    # 4. report
-    report = generate_report(devices, config_res, validation, args.output)
+    # temp file next to the report (never the report path itself); removed
+    # even if the MQTT connect or the report step fails
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(args.output) or ".",
+                                     suffix=".ndjson", delete=False) as tmp:
+        results_path = tmp.name
+    try:
+        subscribe_and_validate(
+            args.mqtt_host, args.mqtt_port, topic,
+            args.duration, args.mqtt_user, args.mqtt_pass, results_path,
+            trigger_ip=target if args.quick else None,
+            web_user=args.web_user, web_pass=args.web_pass,
+        )
+
+        # 4. report
+        report = generate_report(devices, config_res, results_path, args.output)
+    finally:
+        os.remove(results_path)
     status = "PASS ✓" if report["summary"]["pass"] else "FAIL ✗"
     print(f"\nResult: {status}  ({report['summary']['valid']}/{report['summary']['messages_received']} valid)")
 